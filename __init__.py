@@ -5,9 +5,11 @@ import random
 import time
 import math
 import json
+from collections import deque
+from functools import lru_cache
 from typing import List, Tuple, Optional, Dict, Any, Callable
 
-from aqt import mw
+from aqt import gui_hooks, mw
 from aqt.utils import showInfo, qconnect, tooltip
 from aqt.qt import *
 from anki.cards import Card
@@ -16,14 +18,32 @@ from anki.cards import Card
 CELL_SIZE = 30
 GRID_WIDTH = 19
 GRID_HEIGHT = 22
+PADDED_WIDTH = GRID_WIDTH + 2  # Row stride of the wall mask, which has a 1-cell border
 GAME_WIDTH = CELL_SIZE * GRID_WIDTH
 GAME_HEIGHT = CELL_SIZE * GRID_HEIGHT
+SCORE_LINE_RECT = QRect(0, 0, GAME_WIDTH, CELL_SIZE)  # Score, high score and lives share the top row
+QUOTA_LINE_RECT = QRect(0, GAME_HEIGHT - CELL_SIZE, GAME_WIDTH, CELL_SIZE)  # Cards left to review, while play is locked
 
-# Directions
-UP = (0, -1)
-DOWN = (0, 1)
-LEFT = (-1, 0)
-RIGHT = (1, 0)
+# Directions, encoded as small integers indexing the lookup tables below
+UP = 0
+DOWN = 1
+LEFT = 2
+RIGHT = 3
+DIRECTIONS = (UP, DOWN, LEFT, RIGHT)
+DX = (0, 0, -1, 1)  # Column step for each direction
+DY = (-1, 1, 0, 0)  # Row step for each direction
+REVERSE = (DOWN, UP, RIGHT, LEFT)  # Opposite of each direction
+PACMAN_FACING_ANGLE = (270, 90, 180, 0)  # Angle Pacman's mouth points at for each direction
+PACMAN_ANIM_FRAMES = 4
+
+def _pacman_arc(direction, frame) -> Tuple[int, int]:
+    """Pacman's pie start and span angles, in the 1/16ths of a degree drawPie takes"""
+    # Animation - mouth opens and closes
+    mouth_angle = abs(45 - frame * 15)
+    return (PACMAN_FACING_ANGLE[direction] + mouth_angle) * 16, (360 - 2 * mouth_angle) * 16
+
+PACMAN_ARCS = {(direction, frame): _pacman_arc(direction, frame)
+               for direction in DIRECTIONS for frame in range(PACMAN_ANIM_FRAMES)}
 
 # Game state constants
 GAME_STOPPED = 0
@@ -44,10 +64,51 @@ GHOST_COLORS = [
     QColor(0, 255, 255),    # Cyan (Inky)
     QColor(255, 184, 82)    # Orange (Clyde)
 ]
+NUM_GHOSTS = len(GHOST_COLORS)
+GHOST_START_POSITIONS = ((9, 9), (10, 9), (8, 9), (11, 9))
+GHOST_START_DIRECTIONS = (LEFT, UP, DOWN, RIGHT)
+TARGET_PACMAN_ROLL = 102  # Out of 256, so ghosts target Pacman ~40% of the time
 GHOST_FRIGHTENED_COLOR = QColor(0, 0, 255)  # Blue for frightened ghosts
+GHOST_FLASH_COLOR = QColor(255, 255, 255)  # White flash before frightened ghosts recover
 GHOST_EYES_COLOR = QColor(255, 255, 255)  # White for ghost eyes
 GHOST_PUPILS_COLOR = QColor(0, 0, 255)    # Blue for ghost pupils
 
+# Brushes and pens, built once so painting doesn't allocate new ones every frame
+WALL_BRUSH = QBrush(WALL_COLOR)
+BACKGROUND_BRUSH = QBrush(BACKGROUND_COLOR)
+PACMAN_BRUSH = QBrush(PACMAN_COLOR)
+DOT_BRUSH = QBrush(DOT_COLOR)
+POWER_PELLET_BRUSH = QBrush(POWER_PELLET_COLOR)
+GHOST_BRUSHES = [QBrush(color) for color in GHOST_COLORS]
+GHOST_FRIGHTENED_BRUSH = QBrush(GHOST_FRIGHTENED_COLOR)
+GHOST_FLASH_BRUSH = QBrush(GHOST_FLASH_COLOR)
+GHOST_EYES_BRUSH = QBrush(GHOST_EYES_COLOR)
+GHOST_PUPILS_BRUSH = QBrush(GHOST_PUPILS_COLOR)
+GHOST_BODY_BRUSHES = (*GHOST_BRUSHES, GHOST_FRIGHTENED_BRUSH, GHOST_FLASH_BRUSH, None)  # Ghost sprite bodies, by index
+GHOST_BODY_FRIGHTENED = NUM_GHOSTS
+GHOST_BODY_FLASH = NUM_GHOSTS + 1
+GHOST_BODY_NONE = NUM_GHOSTS + 2  # Eaten ghosts are just eyes
+TEXT_PEN = QPen(TEXT_COLOR)
+PACMAN_PEN = QPen(PACMAN_COLOR)
+QUOTA_PEN = QPen(QColor(255, 165, 0))  # Orange
+GAME_OVER_PEN = QPen(QColor(255, 0, 0))  # Red for game over
+HIGH_SCORE_PEN = QPen(QColor(255, 215, 0))  # Gold for high score
+PAUSED_OVERLAY_BRUSH = QBrush(QColor(0, 0, 0, 150))  # Semi-transparent overlays
+MENU_OVERLAY_BRUSH = QBrush(QColor(0, 0, 0, 180))
+
+# Fonts
+SCORE_FONT = QFont("Arial", 10, QFont.Weight.Bold)
+PAUSED_FONT = QFont("Arial", 20, QFont.Weight.Bold)
+TITLE_FONT = QFont("Arial", 26, QFont.Weight.Bold)
+GAME_OVER_FONT = QFont("Arial", 24, QFont.Weight.Bold)
+FINAL_SCORE_FONT = QFont("Arial", 16)
+REVIEW_FONT = QFont("Arial", 14)
+MESSAGE_FONT = QFont("Arial", 12)
+
+# Shapes
+WALL_CELL_PATH = QPainterPath()  # One rounded wall cell at the origin, moved into place per cell
+WALL_CELL_PATH.addRoundedRect(0, 0, CELL_SIZE, CELL_SIZE, 3, 3)
+
 # Quota and game settings
 # Store in user_files folder to persist across add-on updates
 ADDON_DIR = os.path.dirname(__file__)
@@ -55,8 +116,21 @@ USER_FILES_DIR = os.path.join(ADDON_DIR, "user_files")
 SETTINGS_FILE = os.path.join(USER_FILES_DIR, "pacman_settings.json")
 
 # Create user_files folder if it doesn't exist
-if not os.path.exists(USER_FILES_DIR):
-    os.makedirs(USER_FILES_DIR)
+@lru_cache(maxsize=1)
+def _ensure_user_files():
+    """Make sure the user_files folder exists; after the first success this is a cache hit"""
+    os.makedirs(USER_FILES_DIR, exist_ok=True)
+
+def _create_user_files_dir():
+    """Create the user_files folder, reporting rather than raising errors"""
+    try:
+        _ensure_user_files()
+    except OSError as e:
+        print(f"Error creating user_files directory: {e}")
+
+# Nothing at import time needs the folder (settings are only read if the file exists),
+# so a slow filesystem doesn't hold up Anki's startup
+QThreadPool.globalInstance().start(_create_user_files_dir)
 
 # Default settings
 DEFAULT_SETTINGS = {
@@ -68,9 +142,226 @@ DEFAULT_SETTINGS = {
     "selected_deck_id": None
 }
 
+# Maze layout - 0 is wall, 1 is path with dot, 2 is empty path, 3 is power pellet
+# More authentic Pacman-style maze, stored as one contiguous row-major byte array
+MAZE_LAYOUT = bytes(cell for row in [
+    [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+    [0, 1, 1, 1, 1, 1, 1, 1, 1, 0, 1, 1, 1, 1, 1, 1, 1, 1, 0],
+    [0, 3, 0, 0, 1, 0, 0, 0, 1, 0, 1, 0, 0, 0, 1, 0, 0, 3, 0],
+    [0, 1, 0, 0, 1, 0, 0, 0, 1, 0, 1, 0, 0, 0, 1, 0, 0, 1, 0],
+    [0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0],
+    [0, 1, 0, 0, 1, 0, 1, 0, 0, 0, 0, 0, 1, 0, 1, 0, 0, 1, 0],
+    [0, 1, 1, 1, 1, 0, 1, 1, 1, 0, 1, 1, 1, 0, 1, 1, 1, 1, 0],
+    [0, 0, 0, 0, 1, 0, 0, 0, 2, 0, 2, 0, 0, 0, 1, 0, 0, 0, 0],
+    [0, 0, 0, 0, 1, 0, 2, 2, 2, 2, 2, 2, 2, 0, 1, 0, 0, 0, 0],
+    [0, 0, 0, 0, 1, 0, 2, 0, 0, 2, 0, 0, 2, 0, 1, 0, 0, 0, 0],
+    [2, 2, 2, 2, 1, 2, 2, 0, 2, 2, 2, 0, 2, 2, 1, 2, 2, 2, 2],
+    [0, 0, 0, 0, 1, 0, 2, 0, 0, 0, 0, 0, 2, 0, 1, 0, 0, 0, 0],
+    [0, 0, 0, 0, 1, 0, 2, 2, 2, 2, 2, 2, 2, 0, 1, 0, 0, 0, 0],
+    [0, 0, 0, 0, 1, 0, 2, 0, 0, 0, 0, 0, 2, 0, 1, 0, 0, 0, 0],
+    [0, 1, 1, 1, 1, 1, 1, 1, 1, 0, 1, 1, 1, 1, 1, 1, 1, 1, 0],
+    [0, 1, 0, 0, 1, 0, 0, 0, 1, 0, 1, 0, 0, 0, 1, 0, 0, 1, 0],
+    [0, 3, 1, 0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0, 1, 3, 0],
+    [0, 0, 1, 0, 1, 0, 1, 0, 0, 0, 0, 0, 1, 0, 1, 0, 1, 0, 0],
+    [0, 1, 1, 1, 1, 0, 1, 1, 1, 0, 1, 1, 1, 0, 1, 1, 1, 1, 0],
+    [0, 1, 0, 0, 0, 0, 0, 0, 1, 0, 1, 0, 0, 0, 0, 0, 0, 1, 0],
+    [0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0],
+    [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
+] for cell in row)
+
+def _layout_cells(value) -> Tuple[Tuple[int, int], ...]:
+    """Collect the (x, y) coordinates of every MAZE_LAYOUT cell holding value"""
+    return tuple((cell % GRID_WIDTH, cell // GRID_WIDTH)
+                 for cell, cell_value in enumerate(MAZE_LAYOUT) if cell_value == value)
+
+# Cells of each kind, so the pixmap builders never scan the whole maze
+WALL_CELLS = _layout_cells(0)
+DOT_CELLS = _layout_cells(1)
+POWER_PELLET_CELLS = _layout_cells(3)
+
+
+# Ghost AI - plain functions over the maze tables and per-ghost lists, kept free of
+# widget state so the per-frame game logic stays separate from the Qt code
+def move_ghosts(ghost_pos, ghost_prev_pos, ghost_dir, ghost_frightened, ghost_eaten, ghost_return_path,
+                walkable, exits, next_step_to_house, pacman_pos, ghost_house_pos, rand_bits):
+    """Move every ghost one step according to AI rules, updating the per-ghost lists in place"""
+    # Store previous positions before moving
+    ghost_prev_pos[:] = ghost_pos
+    
+    for i in range(NUM_GHOSTS):
+        # Each ghost takes 16 pre-rolled random bits: the low byte decides whether
+        # it targets Pacman, the high byte picks among its possible directions
+        roll = rand_bits & 0xFF
+        pick = (rand_bits >> 8) & 0xFF
+        rand_bits >>= 16
+        
+        # If ghost is eaten, move it back to ghost house
+        if ghost_eaten[i]:
+            # If we have a return path, follow it
+            if ghost_return_path[i]:
+                ghost_pos[i] = ghost_return_path[i].pop(0)
+                # If the ghost reached the ghost house, it's no longer eaten
+                if ghost_pos[i] == ghost_house_pos:
+                    ghost_eaten[i] = False
+            else:
+                # Look up the shortest path to the ghost house
+                ghost_return_path[i] = calculate_path_to_ghost_house(ghost_pos[i], next_step_to_house)
+                if not ghost_return_path[i]:
+                    # Already home (or cut off from it), so stop being eaten
+                    ghost_eaten[i] = False
+            continue
+        
+        # Ghost AI - smarter movement
+        # Current position and direction
+        x, y = ghost_pos[i]
+        curr_dir = ghost_dir[i]
+        
+        # Ghosts never reverse direction (except when frightened)
+        # Walkable directions out of this cell are precomputed
+        frightened = ghost_frightened[i]
+        if frightened:
+            valid_dirs = exits[y * GRID_WIDTH + x]
+        else:
+            reverse_dir = REVERSE[curr_dir]
+            valid_dirs = [direction for direction in exits[y * GRID_WIDTH + x] if direction != reverse_dir]
+        
+        # If there are valid directions, choose one based on ghost behavior
+        if valid_dirs:
+            if frightened:
+                # When frightened, move randomly
+                curr_dir = valid_dirs[pick * len(valid_dirs) >> 8]
+            else:
+                # When normal, use targeting behavior
+                # For simplicity, we'll just make ghosts slightly smarter by
+                # having a chance to move toward Pacman rather than randomly
+                if roll < TARGET_PACMAN_ROLL:  # 40% chance to target Pacman
+                    # Find direction that gets closest to Pacman
+                    best_dir = None
+                    best_dist = float('inf')
+                    
+                    pacman_x, pacman_y = pacman_pos
+                    for direction in valid_dirs:
+                        # Calculate Manhattan distance to Pacman
+                        dist = abs(x + DX[direction] - pacman_x) + abs(y + DY[direction] - pacman_y)
+                        
+                        # Choose direction that minimizes distance
+                        if dist < best_dist:
+                            best_dist = dist
+                            best_dir = direction
+                    
+                    curr_dir = best_dir
+                else:
+                    # Otherwise move randomly from valid directions
+                    curr_dir = valid_dirs[pick * len(valid_dirs) >> 8]
+            ghost_dir[i] = curr_dir
+        
+        # Move ghost in the chosen direction
+        next_x = x + DX[curr_dir]
+        next_y = y + DY[curr_dir]
+        
+        # Check if movement is valid
+        if walkable[(next_y + 1) * PADDED_WIDTH + next_x + 1]:
+            ghost_pos[i] = (next_x, next_y)
+        # Handle tunnel warping
+        elif next_x < 0 and y == 10:  # Left tunnel
+            ghost_pos[i] = (GRID_WIDTH - 1, 10)
+        elif next_x >= GRID_WIDTH and y == 10:  # Right tunnel
+            ghost_pos[i] = (0, 10)
+        else:
+            # If movement is invalid, choose a new random direction
+            ghost_dir[i] = DIRECTIONS[pick & 3]
+
+
+def create_next_step_table(target_pos, walkable):
+    """Breadth-first search from target_pos, giving every cell its next step on a shortest path there"""
+    # Indexed like the maze; None for the target itself and for unreachable cells
+    next_step = [None] * (GRID_WIDTH * GRID_HEIGHT)
+    visited = {target_pos}
+    queue = deque([target_pos])
+    
+    # Loop-invariant lookups bound to locals
+    steps = tuple(zip(DX, DY))
+    popleft, append, visit = queue.popleft, queue.append, visited.add
+    
+    while queue:
+        x, y = popleft()
+        for dx, dy in steps:
+            nx = x + dx
+            ny = y + dy
+            # The mask's border means no bounds checks are needed
+            if (nx, ny) not in visited and walkable[(ny + 1) * PADDED_WIDTH + nx + 1]:
+                visit((nx, ny))
+                next_step[ny * GRID_WIDTH + nx] = (x, y)
+                append((nx, ny))
+    
+    return next_step
+
+
+def calculate_path_to_ghost_house(start_pos, next_step_to_house):
+    """Calculate the shortest path from a position to the ghost house (excluding start_pos)"""
+    path = []
+    x, y = start_pos
+    next_pos = next_step_to_house[y * GRID_WIDTH + x]
+    
+    while next_pos is not None:
+        path.append(next_pos)
+        x, y = next_pos
+        next_pos = next_step_to_house[y * GRID_WIDTH + x]
+    
+    return path
+
+
+# Pacman movement and collisions - like the ghost AI, plain functions over the maze
+# tables and positions that the widget calls once per move step
+def move_pacman(pacman_pos, pacman_dir, pacman_next_dir, walkable):
+    """Move Pacman one step, turning first if the requested direction is open; returns (pos, dir)"""
+    x, y = pacman_pos
+    
+    # Try to change direction if requested
+    if pacman_next_dir != pacman_dir:
+        # Check if the direction change is valid
+        if walkable[(y + DY[pacman_next_dir] + 1) * PADDED_WIDTH + x + DX[pacman_next_dir] + 1]:
+            pacman_dir = pacman_next_dir
+    
+    # Move Pacman in current direction
+    next_x = x + DX[pacman_dir]
+    next_y = y + DY[pacman_dir]
+    
+    # Check if movement is valid
+    if walkable[(next_y + 1) * PADDED_WIDTH + next_x + 1]:
+        return (next_x, next_y), pacman_dir
+    # Handle tunnel warping
+    elif next_x < 0 and y == 10:  # Left tunnel
+        return (GRID_WIDTH - 1, 10), pacman_dir
+    elif next_x >= GRID_WIDTH and y == 10:  # Right tunnel
+        return (0, 10), pacman_dir
+    return pacman_pos, pacman_dir
+
+
+def colliding_ghosts(pacman_pos, pacman_prev_pos, ghost_pos, ghost_prev_pos):
+    """List the ghosts that share Pacman's cell or swapped cells with Pacman this step, in order"""
+    # Checking both exact position matches and pass-through scenarios
+    return [
+        i for i in range(NUM_GHOSTS)
+        if ghost_pos[i] == pacman_pos or (ghost_prev_pos[i] == pacman_pos and pacman_prev_pos == ghost_pos[i])
+    ]
+
+
 # Global reference to the main dialog to prevent it from being garbage collected
 pacman_dialog = None
 
+def _forget_pacman_dialog():
+    """Drop the global reference once Qt has deleted the dialog, e.g. along with the main window"""
+    global pacman_dialog
+    pacman_dialog = None
+
+def _flush_pacman_settings():
+    """Write any debounced settings change before the profile closes"""
+    if pacman_dialog is not None:
+        pacman_dialog.game.flush_settings()
+
+gui_hooks.profile_will_close.append(_flush_pacman_settings)
+
 # Pacman game class
 class PacmanGame(QWidget):
     def __init__(self, parent=None, on_game_over=None):
@@ -78,12 +369,39 @@ class PacmanGame(QWidget):
         self.setFixedSize(GAME_WIDTH, GAME_HEIGHT)
         self.setFocusPolicy(Qt.FocusPolicy.StrongFocus)
         
-        # Set up double buffering for smoother graphics
+        # Qt double-buffers widget painting itself, so paintEvent draws directly
         self.setAutoFillBackground(False)
         
+        # paintEvent fills the whole widget, so Qt can skip clearing the background first
+        self.setAttribute(Qt.WidgetAttribute.WA_OpaquePaintEvent, True)
+        self.setAttribute(Qt.WidgetAttribute.WA_NoSystemBackground, True)
+        
         # Load the maze layout
         self.maze = self._create_maze()
         
+        # Walls never change, so walkability is computed once
+        self.walkable = self._create_walkable_mask()
+        self.exits = self._create_exits()
+        
+        # Ghost shapes shared by every ghost and frame
+        self._ghost_body_path, self._ghost_waves_path = self._create_ghost_paths()
+        
+        # Maze graphics cached for painting
+        self._maze_pixmap = None  # Background and walls, rendered on first paint
+        self._dots_pixmap = None  # Remaining dots, rendered on first paint
+        self._pellet_positions = set()
+        
+        # Score line and game state messages, re-rendered only when what they show changes
+        self._ui_pixmap = None  # Score line strip, allocated once and refilled
+        self._quota_pixmap = None  # Quota line strip, only needed while play is locked
+        self._ui_dirty = True
+        self._overlay_pixmap = None
+        self._overlay_state = None  # Game state the overlay pixmap was rendered for
+        
+        # Cell-sized sprites, rendered the first time each variant is drawn
+        self._pacman_sprites = {}  # (direction, animation frame) -> QPixmap
+        self._ghost_sprites = {}  # (GHOST_BODY_BRUSHES index, direction) -> QPixmap
+        
         # Load settings
         self.settings = self._load_settings()
         
@@ -113,53 +431,25 @@ class PacmanGame(QWidget):
         self.power_pellet_flash = False
         self.power_pellet_flash_timer = 0
         
-        # Initialize ghosts
-        self.ghosts = [
-            {
-                "pos": (9, 9),          # Starting position
-                "prev_pos": (9, 9),     # Track previous position for collision detection
-                "dir": LEFT,            # Starting direction
-                "color": GHOST_COLORS[0],  # Ghost color
-                "frightened": False,    # Is ghost frightened?
-                "eaten": False,         # Is ghost eaten?
-                "return_path": []       # Path to return to ghost house when eaten
-            },
-            {
-                "pos": (10, 9),
-                "prev_pos": (10, 9),
-                "dir": UP,
-                "color": GHOST_COLORS[1],
-                "frightened": False,
-                "eaten": False,
-                "return_path": []
-            },
-            {
-                "pos": (8, 9),
-                "prev_pos": (8, 9),
-                "dir": DOWN,
-                "color": GHOST_COLORS[2],
-                "frightened": False,
-                "eaten": False,
-                "return_path": []
-            },
-            {
-                "pos": (11, 9),
-                "prev_pos": (11, 9),
-                "dir": RIGHT,
-                "color": GHOST_COLORS[3],
-                "frightened": False,
-                "eaten": False,
-                "return_path": []
-            }
-        ]
+        # Initialize ghosts (one entry per ghost in each list, indexed like GHOST_COLORS)
+        self._reset_ghosts()
         
         # Ghost house coordinates for returning eaten ghosts
         self.ghost_house_pos = (9, 9)
         
+        # Shortest-path table towards the ghost house, computed once since walls never change
+        self.next_step_to_house = create_next_step_table(self.ghost_house_pos, self.walkable)
+        
         # Timer for game updates - higher framerate for smoother animation
         self.timer = QTimer(self)
         self.timer.timeout.connect(self.update_game)
         
+        # Settings writes are debounced so bursts of changes cost one file write
+        self._save_timer = QTimer(self)
+        self._save_timer.setSingleShot(True)
+        self._save_timer.setInterval(250)
+        self._save_timer.timeout.connect(self._write_settings)
+        
         # Game speed (milliseconds per frame) - lower for smoother gameplay
         self.base_speed = 1000 // self.fps  # ~22.2ms for 45 FPS
         self.speed = self.base_speed
@@ -172,16 +462,26 @@ class PacmanGame(QWidget):
         self.move_counter = 0
         self.move_delay = 8  # Increased from 5 to 8 for slower movement
         
-        # FPS Monitoring (for debugging)
+        # FPS Monitoring (for debugging) - off by default to keep it out of the frame loop
+        self.fps_debug = False
         self.last_update_time = time.time()
-        self.frame_times = []
+        self.frame_times = deque(maxlen=10)
         
         # Callback for game over
         self.on_game_over = on_game_over
         
         # Check if player is allowed to play (based on quota)
         self.can_play = self.settings["can_play"]
-        
+        self._refresh_quota_text()
+        
+    def _refresh_quota_text(self):
+        """Format the quota messages from the settings, which only change between games"""
+        cards_left = self.settings["cards_quota"] - self.settings["cards_completed"]
+        self._quota_short = f"Cards to Review: {cards_left}"
+        self._quota_long = f"You need to review {cards_left} more card(s) to play"
+        self._quota_review = f"Time to review {self.settings['cards_quota']} flashcards!"
+        self._ui_dirty = True  # The quota is shown by the UI layer
+    
     def _load_settings(self):
         """Load game settings from file"""
         if os.path.exists(SETTINGS_FILE):
@@ -214,13 +514,26 @@ class PacmanGame(QWidget):
             return default_settings
     
     def _save_settings(self):
-        """Save game settings to file"""
+        """Schedule a save of the game settings (written shortly after the last change)"""
+        self._save_timer.start()
+    
+    def _write_settings(self):
+        """Write game settings to file, replacing the old file atomically"""
+        self._save_timer.stop()
+        temp_file = SETTINGS_FILE + ".tmp"
         try:
-            with open(SETTINGS_FILE, 'w') as f:
+            _ensure_user_files()  # In case the startup task failed or hasn't run yet
+            with open(temp_file, 'w') as f:
                 json.dump(self.settings, f)
+            os.replace(temp_file, SETTINGS_FILE)
         except Exception as e:
             tooltip(f"Error saving settings: {str(e)}")
     
+    def flush_settings(self):
+        """Write any pending settings change immediately"""
+        if self._save_timer.isActive():
+            self._write_settings()
+    
     def _update_high_score(self, score):
         """Update high score if needed"""
         if score > self.settings["high_score"]:
@@ -228,43 +541,42 @@ class PacmanGame(QWidget):
             self.high_score = score
             self._save_settings()
     
-    def _create_maze(self) -> List[List[int]]:
-        """Create the maze layout - 0 is wall, 1 is path with dot, 2 is empty path, 3 is power pellet"""
-        # More authentic Pacman-style maze
-        maze = [
-            [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 1, 1, 1, 1, 1, 1, 1, 1, 0, 1, 1, 1, 1, 1, 1, 1, 1, 0],
-            [0, 3, 0, 0, 1, 0, 0, 0, 1, 0, 1, 0, 0, 0, 1, 0, 0, 3, 0],
-            [0, 1, 0, 0, 1, 0, 0, 0, 1, 0, 1, 0, 0, 0, 1, 0, 0, 1, 0],
-            [0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0],
-            [0, 1, 0, 0, 1, 0, 1, 0, 0, 0, 0, 0, 1, 0, 1, 0, 0, 1, 0],
-            [0, 1, 1, 1, 1, 0, 1, 1, 1, 0, 1, 1, 1, 0, 1, 1, 1, 1, 0],
-            [0, 0, 0, 0, 1, 0, 0, 0, 2, 0, 2, 0, 0, 0, 1, 0, 0, 0, 0],
-            [0, 0, 0, 0, 1, 0, 2, 2, 2, 2, 2, 2, 2, 0, 1, 0, 0, 0, 0],
-            [0, 0, 0, 0, 1, 0, 2, 0, 0, 2, 0, 0, 2, 0, 1, 0, 0, 0, 0],
-            [2, 2, 2, 2, 1, 2, 2, 0, 2, 2, 2, 0, 2, 2, 1, 2, 2, 2, 2],
-            [0, 0, 0, 0, 1, 0, 2, 0, 0, 0, 0, 0, 2, 0, 1, 0, 0, 0, 0],
-            [0, 0, 0, 0, 1, 0, 2, 2, 2, 2, 2, 2, 2, 0, 1, 0, 0, 0, 0],
-            [0, 0, 0, 0, 1, 0, 2, 0, 0, 0, 0, 0, 2, 0, 1, 0, 0, 0, 0],
-            [0, 1, 1, 1, 1, 1, 1, 1, 1, 0, 1, 1, 1, 1, 1, 1, 1, 1, 0],
-            [0, 1, 0, 0, 1, 0, 0, 0, 1, 0, 1, 0, 0, 0, 1, 0, 0, 1, 0],
-            [0, 3, 1, 0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0, 1, 3, 0],
-            [0, 0, 1, 0, 1, 0, 1, 0, 0, 0, 0, 0, 1, 0, 1, 0, 1, 0, 0],
-            [0, 1, 1, 1, 1, 0, 1, 1, 1, 0, 1, 1, 1, 0, 1, 1, 1, 1, 0],
-            [0, 1, 0, 0, 0, 0, 0, 0, 1, 0, 1, 0, 0, 0, 0, 0, 0, 1, 0],
-            [0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
-        ]
-        return maze
+    def _reset_ghosts(self):
+        """Put every ghost back at its starting position and state"""
+        self.ghost_pos = list(GHOST_START_POSITIONS)
+        self.ghost_prev_pos = list(GHOST_START_POSITIONS)  # Track previous position for collision detection
+        self.ghost_dir = list(GHOST_START_DIRECTIONS)
+        self.ghost_frightened = [False] * NUM_GHOSTS  # Is ghost frightened?
+        self.ghost_eaten = [False] * NUM_GHOSTS  # Is ghost eaten?
+        self.ghost_return_path = [[] for _ in range(NUM_GHOSTS)]  # Path to return to ghost house when eaten
+    
+    def _create_maze(self) -> bytearray:
+        """Create a fresh, mutable copy of the maze layout (indexed as y * GRID_WIDTH + x)"""
+        return bytearray(MAZE_LAYOUT)
+    
+    def _create_walkable_mask(self) -> bytes:
+        """Create a wall mask padded by one cell on each side, so out-of-bounds cells are never walkable"""
+        walkable = bytearray(PADDED_WIDTH * (GRID_HEIGHT + 2))
+        for cell, cell_value in enumerate(MAZE_LAYOUT):
+            y, x = divmod(cell, GRID_WIDTH)
+            walkable[(y + 1) * PADDED_WIDTH + x + 1] = cell_value != 0
+        return bytes(walkable)
+    
+    def _create_exits(self) -> List[Tuple[int, ...]]:
+        """Precompute the walkable directions out of every cell, in DIRECTIONS order"""
+        walkable = self.walkable
+        exits = []
+        for cell in range(GRID_WIDTH * GRID_HEIGHT):
+            y, x = divmod(cell, GRID_WIDTH)
+            exits.append(tuple(
+                direction for direction in DIRECTIONS
+                if walkable[(y + 1 + DY[direction]) * PADDED_WIDTH + x + 1 + DX[direction]]
+            ))
+        return exits
     
     def _count_dots(self) -> int:
         """Count the number of dots in the maze"""
-        count = 0
-        for row in self.maze:
-            for cell in row:
-                if cell == 1 or cell == 3:  # Dots and power pellets
-                    count += 1
-        return count
+        return self.maze.count(1) + self.maze.count(3)  # Dots and power pellets
     
     def start_game(self):
         """Start or restart the game"""
@@ -280,6 +592,8 @@ class PacmanGame(QWidget):
         self.lives = 3
         self.maze = self._create_maze()
         self.dots_left = self._count_dots()
+        self._dots_pixmap = None
+        self._ui_dirty = True
         self.power_pellet_active = False
         self.power_pellet_timer = 0
         
@@ -290,52 +604,16 @@ class PacmanGame(QWidget):
         self.pacman_next_dir = LEFT
         
         # Reset ghosts
-        self.ghosts = [
-            {
-                "pos": (9, 9),
-                "prev_pos": (9, 9),  # Track previous position
-                "dir": LEFT,
-                "color": GHOST_COLORS[0],
-                "frightened": False,
-                "eaten": False,
-                "return_path": []
-            },
-            {
-                "pos": (10, 9),
-                "prev_pos": (10, 9),  # Track previous position
-                "dir": UP,
-                "color": GHOST_COLORS[1],
-                "frightened": False,
-                "eaten": False,
-                "return_path": []
-            },
-            {
-                "pos": (8, 9),
-                "prev_pos": (8, 9),  # Track previous position
-                "dir": DOWN,
-                "color": GHOST_COLORS[2],
-                "frightened": False,
-                "eaten": False,
-                "return_path": []
-            },
-            {
-                "pos": (11, 9),
-                "prev_pos": (11, 9),  # Track previous position
-                "dir": RIGHT,
-                "color": GHOST_COLORS[3],
-                "frightened": False,
-                "eaten": False,
-                "return_path": []
-            }
-        ]
+        self._reset_ghosts()
         
         # Start the timer with a faster rate for smoother animation
         self.timer.start(self.speed)
         self.setFocus()
+        self.update()
         
         # Reset timing variables
         self.last_update_time = time.time()
-        self.frame_times = []
+        self.frame_times = deque(maxlen=10)
         self.move_counter = 0
     
     def pause_game(self):
@@ -346,11 +624,13 @@ class PacmanGame(QWidget):
         elif self.state == GAME_PAUSED:
             self.state = GAME_RUNNING
             self.timer.start(self.speed)
+        self.update()
     
     def stop_game(self):
         """Stop the game"""
         self.state = GAME_STOPPED
         self.timer.stop()
+        self.update()
     
     def update_game(self):
         """Update game state for one frame"""
@@ -358,13 +638,18 @@ class PacmanGame(QWidget):
             return
         
         # Calculate FPS for monitoring
-        current_time = time.time()
-        dt = current_time - self.last_update_time
-        self.last_update_time = current_time
+        if self.fps_debug:
+            current_time = time.time()
+            dt = current_time - self.last_update_time
+            self.last_update_time = current_time
+            
+            self.frame_times.append(dt)  # Rolling window, oldest sample drops off
         
-        if len(self.frame_times) > 10:
-            self.frame_times.pop(0)
-        self.frame_times.append(dt)
+        # Most frames change nothing visible, so only the cells that did are repainted
+        dirty_cells = []
+        score_changed = False
+        repaint_all = False
+        lives = self.lives
         
         # Update animation counter
         self.anim_counter += 1
@@ -374,8 +659,8 @@ class PacmanGame(QWidget):
             self.power_pellet_timer -= 1
             if self.power_pellet_timer <= 0:
                 self.power_pellet_active = False
-                for ghost in self.ghosts:
-                    ghost["frightened"] = False
+                self.ghost_frightened = [False] * NUM_GHOSTS
+                dirty_cells += self.ghost_pos
             
             # Make ghosts flash when power pellet is about to expire
             if self.power_pellet_timer < 10:
@@ -383,229 +668,119 @@ class PacmanGame(QWidget):
                 if self.power_pellet_flash_timer >= 5:
                     self.power_pellet_flash = not self.power_pellet_flash
                     self.power_pellet_flash_timer = 0
+                    dirty_cells += self.ghost_pos
         
         # Only move every few frames for consistent speed
         self.move_counter += 1
         if self.move_counter >= self.move_delay:
             self.move_counter = 0
+            score = self.score
             
             # Move Pacman
             self._move_pacman()
             
+            # Bind per-frame state to locals for the checks below
+            maze = self.maze
+            pacman_pos = self.pacman_pos
+            pacman_prev_pos = self.pacman_prev_pos
+            
             # Check if Pacman eats a dot
-            x, y = self.pacman_pos
-            if self.maze[y][x] == 1:  # Regular dot
-                self.maze[y][x] = 2  # Empty path now
+            x, y = pacman_pos
+            cell = y * GRID_WIDTH + x
+            cell_value = maze[cell]
+            if cell_value == 1:  # Regular dot
+                maze[cell] = 2  # Empty path now
                 self.score += 10
                 self.dots_left -= 1
-            elif self.maze[y][x] == 3:  # Power pellet
-                self.maze[y][x] = 2  # Empty path now
+                self._erase_dot(x, y)
+            elif cell_value == 3:  # Power pellet
+                maze[cell] = 2  # Empty path now
                 self.score += 50
                 self.dots_left -= 1
+                self._pellet_positions.discard((x, y))
                 self.power_pellet_active = True
                 self.power_pellet_timer = self.power_pellet_duration
                 self.power_pellet_flash = False
-                # Make all ghosts frightened
-                for ghost in self.ghosts:
-                    if not ghost["eaten"]:  # Only if not already eaten
-                        ghost["frightened"] = True
+                # Make all ghosts frightened (only if not already eaten)
+                self.ghost_frightened = [not eaten for eaten in self.ghost_eaten]
             
             # Move ghosts
-            for ghost in self.ghosts:
-                self._move_ghost(ghost)
-                
-                # Check if ghost catches Pacman or Pacman eats ghost
-                # Enhanced collision detection to check both exact position matches and pass-through scenarios
-                if (ghost["pos"] == self.pacman_pos) or (ghost["prev_pos"] == self.pacman_pos and self.pacman_prev_pos == ghost["pos"]):
-                    if ghost["frightened"]:
-                        # Pacman eats ghost
-                        ghost["frightened"] = False
-                        ghost["eaten"] = True
-                        self.score += 200
-                    elif not ghost["eaten"]:
-                        # Ghost catches Pacman
-                        self._lose_life()
-                        break
+            self._move_ghosts()
+            
+            # Check if any ghost catches Pacman or Pacman eats a ghost
+            ghost_frightened = self.ghost_frightened
+            ghost_eaten = self.ghost_eaten
+            for i in colliding_ghosts(pacman_pos, pacman_prev_pos, self.ghost_pos, self.ghost_prev_pos):
+                if ghost_frightened[i]:
+                    # Pacman eats ghost
+                    ghost_frightened[i] = False
+                    ghost_eaten[i] = True
+                    self.score += 200
+                elif not ghost_eaten[i]:
+                    # Ghost catches Pacman
+                    self._lose_life()
+                    break
             
             # Check if all dots are eaten
             if self.dots_left == 0:
                 self._win_game()
+            
+            # Score, lives and (at the end of a game) the high score are shown in the UI
+            if self.score != score or self.lives != lives or self.state != GAME_RUNNING:
+                self._ui_dirty = True
+            
+            # Sprites are redrawn in the cells they left and entered; a lost life or
+            # a finished game moves or covers everything, so repaint all of it then
+            if self.state != GAME_RUNNING or self.lives != lives:
+                repaint_all = True
+            else:
+                dirty_cells.append(self.pacman_prev_pos)
+                dirty_cells.append(self.pacman_pos)
+                dirty_cells += self.ghost_prev_pos
+                dirty_cells += self.ghost_pos
+                score_changed = self.score != score
         
         # Increment animation frame at a smoother rate
         if self.anim_counter % 8 == 0:  # Change frame every 8 game updates
-            self.pacman_anim_frame = (self.pacman_anim_frame + 1) % 4
+            self.pacman_anim_frame = (self.pacman_anim_frame + 1) % PACMAN_ANIM_FRAMES
+            dirty_cells.append(self.pacman_pos)
         
         # Update blink state for power pellets and other blinking elements
         self.blink_timer += 1
         if self.blink_timer >= 15:  # Change blink state every 15 frames
             self.blink_state = not self.blink_state
             self.blink_timer = 0
+            dirty_cells += self._pellet_positions
         
         # Update display using Qt's update method
-        self.update()
+        if repaint_all:
+            self.update()
+        elif dirty_cells:
+            region = self._cells_region(dirty_cells)
+            if score_changed:
+                region = region.united(SCORE_LINE_RECT)
+            self.update(region)
+    
+    def _cells_region(self, cells) -> QRegion:
+        """Build the region covering the given (x, y) cells"""
+        region = QRegion()
+        for x, y in set(cells):
+            region = region.united(QRect(x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE))
+        return region
     
     def _move_pacman(self):
         """Move Pacman according to its direction"""
         # Store previous position before moving
         self.pacman_prev_pos = self.pacman_pos
-        
-        # Try to change direction if requested
-        if self.pacman_next_dir != self.pacman_dir:
-            next_x = self.pacman_pos[0] + self.pacman_next_dir[0]
-            next_y = self.pacman_pos[1] + self.pacman_next_dir[1]
-            
-            # Check if the direction change is valid
-            if 0 <= next_x < GRID_WIDTH and 0 <= next_y < GRID_HEIGHT and self.maze[next_y][next_x] != 0:
-                self.pacman_dir = self.pacman_next_dir
-        
-        # Move Pacman in current direction
-        next_x = self.pacman_pos[0] + self.pacman_dir[0]
-        next_y = self.pacman_pos[1] + self.pacman_dir[1]
-        
-        # Check if movement is valid
-        if 0 <= next_x < GRID_WIDTH and 0 <= next_y < GRID_HEIGHT and self.maze[next_y][next_x] != 0:
-            self.pacman_pos = (next_x, next_y)
-        # Handle tunnel warping
-        elif next_x < 0 and self.pacman_pos[1] == 10:  # Left tunnel
-            self.pacman_pos = (GRID_WIDTH - 1, 10)
-        elif next_x >= GRID_WIDTH and self.pacman_pos[1] == 10:  # Right tunnel
-            self.pacman_pos = (0, 10)
+        self.pacman_pos, self.pacman_dir = move_pacman(self.pacman_pos, self.pacman_dir,
+                                                       self.pacman_next_dir, self.walkable)
     
-    def _move_ghost(self, ghost):
-        """Move a ghost according to AI rules"""
-        # Store previous position before moving
-        ghost["prev_pos"] = ghost["pos"]
-        
-        # If ghost is eaten, move it back to ghost house
-        if ghost["eaten"]:
-            # If we have a return path, follow it
-            if ghost["return_path"]:
-                ghost["pos"] = ghost["return_path"].pop(0)
-                # If the ghost reached the ghost house, it's no longer eaten
-                if ghost["pos"] == self.ghost_house_pos:
-                    ghost["eaten"] = False
-                return
-            else:
-                # Calculate a direct path to the ghost house
-                ghost["return_path"] = self._calculate_path_to_ghost_house(ghost["pos"])
-                return
-        
-        # Ghost AI - smarter movement
-        possible_dirs = [UP, DOWN, LEFT, RIGHT]
-        valid_dirs = []
-        
-        # Current position and direction
-        x, y = ghost["pos"]
-        curr_dir = ghost["dir"]
-        
-        # Ghosts never reverse direction (except when frightened)
-        reverse_dir = (-curr_dir[0], -curr_dir[1])
-        
-        for direction in possible_dirs:
-            # Skip reverse direction unless frightened
-            if direction == reverse_dir and not ghost["frightened"]:
-                continue
-                
-            next_x = x + direction[0]
-            next_y = y + direction[1]
-            
-            # Check if direction is valid (not a wall)
-            if (0 <= next_x < GRID_WIDTH and 0 <= next_y < GRID_HEIGHT and 
-                self.maze[next_y][next_x] != 0):
-                valid_dirs.append(direction)
-        
-        # If there are valid directions, choose one based on ghost behavior
-        if valid_dirs:
-            if ghost["frightened"]:
-                # When frightened, move randomly
-                ghost["dir"] = random.choice(valid_dirs)
-            else:
-                # When normal, use targeting behavior
-                # For simplicity, we'll just make ghosts slightly smarter by
-                # having a chance to move toward Pacman rather than randomly
-                if random.random() < 0.4:  # 40% chance to target Pacman
-                    # Find direction that gets closest to Pacman
-                    best_dir = None
-                    best_dist = float('inf')
-                    
-                    for direction in valid_dirs:
-                        next_x = x + direction[0]
-                        next_y = y + direction[1]
-                        
-                        # Calculate distance to Pacman
-                        dist = self._manhattan_distance((next_x, next_y), self.pacman_pos)
-                        
-                        # Choose direction that minimizes distance
-                        if dist < best_dist:
-                            best_dist = dist
-                            best_dir = direction
-                    
-                    ghost["dir"] = best_dir
-                else:
-                    # Otherwise move randomly from valid directions
-                    ghost["dir"] = random.choice(valid_dirs)
-        
-        # Move ghost in the chosen direction
-        next_x = ghost["pos"][0] + ghost["dir"][0]
-        next_y = ghost["pos"][1] + ghost["dir"][1]
-        
-        # Check if movement is valid
-        if 0 <= next_x < GRID_WIDTH and 0 <= next_y < GRID_HEIGHT and self.maze[next_y][next_x] != 0:
-            ghost["pos"] = (next_x, next_y)
-        # Handle tunnel warping
-        elif next_x < 0 and ghost["pos"][1] == 10:  # Left tunnel
-            ghost["pos"] = (GRID_WIDTH - 1, 10)
-        elif next_x >= GRID_WIDTH and ghost["pos"][1] == 10:  # Right tunnel
-            ghost["pos"] = (0, 10)
-        else:
-            # If movement is invalid, choose a new random direction
-            ghost["dir"] = random.choice([UP, DOWN, LEFT, RIGHT])
-    
-    def _manhattan_distance(self, pos1, pos2):
-        """Calculate the Manhattan distance between two positions"""
-        return abs(pos1[0] - pos2[0]) + abs(pos1[1] - pos2[1])
-    
-    def _calculate_path_to_ghost_house(self, start_pos):
-        """Calculate a path from a position to the ghost house"""
-        # Simplified - just move directly toward the ghost house
-        path = []
-        curr_pos = start_pos
-        
-        while curr_pos != self.ghost_house_pos:
-            x, y = curr_pos
-            ghost_x, ghost_y = self.ghost_house_pos
-            
-            # Determine which direction to move
-            if x < ghost_x:
-                next_pos = (x + 1, y)
-            elif x > ghost_x:
-                next_pos = (x - 1, y)
-            elif y < ghost_y:
-                next_pos = (x, y + 1)
-            else:
-                next_pos = (x, y - 1)
-            
-            # Ensure we don't go through walls
-            nx, ny = next_pos
-            if 0 <= nx < GRID_WIDTH and 0 <= ny < GRID_HEIGHT and self.maze[ny][nx] != 0:
-                path.append(next_pos)
-                curr_pos = next_pos
-            else:
-                # If blocked by wall, try alternate directions
-                for dir in [UP, DOWN, LEFT, RIGHT]:
-                    alt_x = x + dir[0]
-                    alt_y = y + dir[1]
-                    if (0 <= alt_x < GRID_WIDTH and 0 <= alt_y < GRID_HEIGHT and 
-                        self.maze[alt_y][alt_x] != 0):
-                        path.append((alt_x, alt_y))
-                        curr_pos = (alt_x, alt_y)
-                        break
-            
-            # Safety limit to prevent infinite loops
-            if len(path) > 100:
-                break
-        
-        return path
+    def _move_ghosts(self):
+        """Move every ghost one step according to AI rules"""
+        move_ghosts(self.ghost_pos, self.ghost_prev_pos, self.ghost_dir, self.ghost_frightened,
+                    self.ghost_eaten, self.ghost_return_path, self.walkable, self.exits,
+                    self.next_step_to_house, self.pacman_pos, self.ghost_house_pos,
+                    random.getrandbits(16 * NUM_GHOSTS))
     
     def _lose_life(self):
         """Handle Pacman losing a life"""
@@ -621,44 +796,7 @@ class PacmanGame(QWidget):
             self.pacman_next_dir = LEFT
             
             # Reset ghosts
-            self.ghosts = [
-                {
-                    "pos": (9, 9),
-                    "prev_pos": (9, 9),  # Reset previous position tracking
-                    "dir": LEFT,
-                    "color": GHOST_COLORS[0],
-                    "frightened": False,
-                    "eaten": False,
-                    "return_path": []
-                },
-                {
-                    "pos": (10, 9),
-                    "prev_pos": (10, 9),  # Reset previous position tracking
-                    "dir": UP,
-                    "color": GHOST_COLORS[1],
-                    "frightened": False,
-                    "eaten": False,
-                    "return_path": []
-                },
-                {
-                    "pos": (8, 9),
-                    "prev_pos": (8, 9),  # Reset previous position tracking
-                    "dir": DOWN,
-                    "color": GHOST_COLORS[2],
-                    "frightened": False,
-                    "eaten": False,
-                    "return_path": []
-                },
-                {
-                    "pos": (11, 9),
-                    "prev_pos": (11, 9),  # Reset previous position tracking
-                    "dir": RIGHT,
-                    "color": GHOST_COLORS[3],
-                    "frightened": False,
-                    "eaten": False,
-                    "return_path": []
-                }
-            ]
+            self._reset_ghosts()
             
             # Reset power pellet state
             self.power_pellet_active = False
@@ -684,6 +822,7 @@ class PacmanGame(QWidget):
         self.settings["cards_completed"] = 0
         self.settings["can_play"] = True
         self._save_settings()
+        self._refresh_quota_text()
             
         showInfo(f"You won! Score: {self.score}")
     
@@ -713,6 +852,8 @@ class PacmanGame(QWidget):
         self.settings["cards_completed"] = 0
         self.settings["can_play"] = False
         self._save_settings()
+        self.can_play = False
+        self._refresh_quota_text()
         
         # Call game over callback
         if self.on_game_over:
@@ -732,10 +873,18 @@ class PacmanGame(QWidget):
         
         # Update local variables
         self.can_play = self.settings["can_play"]
+        self._refresh_quota_text()
+        self.update()
+    
+    def hideEvent(self, event):
+        """Make sure pending settings reach the disk when the game is hidden or closed"""
+        self.flush_settings()
+        super().hideEvent(event)
     
     def reset_after_review(self):
         """Reset the game state after returning from a review"""
-        # Update the game state and visuals
+        # Update the game state and visuals (the review may have changed the quota settings)
+        self._refresh_quota_text()
         self.setFocus()
         self.update()
     
@@ -761,185 +910,304 @@ class PacmanGame(QWidget):
     
     def paintEvent(self, event):
         """Draw the game"""
-        # Use a painter with a pixmap for double buffering
-        pixmap = QPixmap(GAME_WIDTH, GAME_HEIGHT)
-        pixmap.fill(Qt.GlobalColor.transparent)
-        
-        painter = QPainter(pixmap)
+        # Paint straight onto the widget - Qt already double-buffers widget painting
+        painter = QPainter(self)
         painter.setRenderHint(QPainter.RenderHint.Antialiasing)  # Enable anti-aliasing for smoother graphics
         
-        # Fill background
-        painter.fillRect(0, 0, GAME_WIDTH, GAME_HEIGHT, BACKGROUND_COLOR)
+        # Only the damaged part of the widget is redrawn, and Qt clips to it
+        region = event.region()
         
-        # Draw maze
-        self._draw_maze(painter)
+        # Draw maze (its cached background covers the whole widget)
+        self._draw_maze(painter, event.rect())
         
         # Draw Pacman
-        self._draw_pacman(painter)
+        x, y = self.pacman_pos
+        if region.intersects(QRect(x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE)):
+            self._draw_pacman(painter)
         
         # Draw ghosts
-        for ghost in self.ghosts:
-            self._draw_ghost(painter, ghost)
+        self._draw_ghosts(painter, region)
         
         # Draw score and lives
-        self._draw_ui(painter)
+        self._draw_ui(painter, event.rect())
         
         # Draw game state messages
-        self._draw_game_state(painter)
+        self._draw_game_state(painter, event.rect())
         
-        # End painter on pixmap
         painter.end()
+    
+    def _create_wall_path(self) -> QPainterPath:
+        """Build the path of all (immutable) wall cells once, as rounded cells"""
+        walls = QPainterPath()
+        walls.setFillRule(Qt.FillRule.WindingFill)
+        add_path, translated = walls.addPath, WALL_CELL_PATH.translated
+        for x, y in WALL_CELLS:
+            add_path(translated(x * CELL_SIZE, y * CELL_SIZE))
+        return walls
+    
+    def _create_pixmap(self, width, height) -> QPixmap:
+        """Create an uninitialized pixmap matching the widget's device pixel ratio"""
+        ratio = self.devicePixelRatioF()
+        pixmap = QPixmap(round(width * ratio), round(height * ratio))
+        pixmap.setDevicePixelRatio(ratio)
+        return pixmap
+    
+    def _rebuild_maze_pixmap(self):
+        """Render the background and walls once into a pixmap that every frame blits"""
+        pixmap = self._create_pixmap(GAME_WIDTH, GAME_HEIGHT)
+        pixmap.fill(BACKGROUND_COLOR)
+        
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.fillPath(self._create_wall_path(), WALL_BRUSH)
+        painter.end()
+        
+        self._maze_pixmap = pixmap
         
-        # Draw the pixmap to the widget
-        screen_painter = QPainter(self)
-        screen_painter.drawPixmap(0, 0, pixmap)
-        screen_painter.end()
+        # Sprites and text share the maze's pixel ratio, so they are re-rendered along with it
+        self._pacman_sprites.clear()
+        self._ghost_sprites.clear()
+        self._ui_pixmap = None
+        self._quota_pixmap = None
+        self._overlay_pixmap = None
     
-    def _draw_maze(self, painter):
-        """Draw the maze layout"""
-        for y in range(GRID_HEIGHT):
-            for x in range(GRID_WIDTH):
-                cell_value = self.maze[y][x]
-                
-                if cell_value == 0:  # Wall
-                    # Draw a rounded wall cell
-                    path = QPainterPath()
-                    path.addRoundedRect(x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE, 3, 3)
-                    painter.fillPath(path, WALL_COLOR)
-                elif cell_value == 1:  # Dot
-                    # Draw a dot in the center of the cell
-                    painter.setBrush(DOT_COLOR)
-                    painter.setPen(Qt.PenStyle.NoPen)
-                    painter.drawEllipse(x * CELL_SIZE + CELL_SIZE//2 - 2, 
-                                       y * CELL_SIZE + CELL_SIZE//2 - 2, 
-                                       4, 4)
-                elif cell_value == 3:  # Power pellet
-                    # Draw a pulsating power pellet
-                    painter.setBrush(POWER_PELLET_COLOR)
-                    painter.setPen(Qt.PenStyle.NoPen)
-                    
-                    # Make power pellets pulsate
-                    size = 10 if self.blink_state else 8
-                    
-                    painter.drawEllipse(x * CELL_SIZE + CELL_SIZE//2 - size//2, 
-                                       y * CELL_SIZE + CELL_SIZE//2 - size//2, 
-                                       size, size)
+    def _create_sprite(self) -> QPixmap:
+        """Create a transparent cell-sized pixmap to render a sprite into"""
+        sprite = self._create_pixmap(CELL_SIZE, CELL_SIZE)
+        sprite.fill(Qt.GlobalColor.transparent)
+        return sprite
+    
+    def _rebuild_dots(self):
+        """Render the remaining dots into a cached pixmap and collect the power pellet cells"""
+        maze = self.maze
+        dots = QPainterPath()
+        add_ellipse = dots.addEllipse
+        offset = CELL_SIZE//2 - 2
+        for x, y in DOT_CELLS:
+            if maze[y * GRID_WIDTH + x] == 1:  # Not eaten yet
+                # A dot in the center of the cell
+                add_ellipse(x * CELL_SIZE + offset, y * CELL_SIZE + offset, 4, 4)
+        
+        # Power pellets are drawn per frame since they pulsate
+        pellet_positions = {(x, y) for x, y in POWER_PELLET_CELLS if maze[y * GRID_WIDTH + x] == 3}
+        
+        pixmap = self._create_pixmap(GAME_WIDTH, GAME_HEIGHT)
+        pixmap.fill(Qt.GlobalColor.transparent)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.fillPath(dots, DOT_BRUSH)
+        painter.end()
+        
+        self._dots_pixmap = pixmap
+        self._pellet_positions = pellet_positions
+    
+    def _erase_dot(self, x, y):
+        """Clear one eaten dot's cell from the cached dots pixmap"""
+        if self._dots_pixmap is None:
+            return  # Rebuilt from the maze on the next paint anyway
+        painter = QPainter(self._dots_pixmap)
+        painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_Clear)
+        painter.fillRect(x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE, Qt.GlobalColor.transparent)
+        painter.end()
+    
+    def _blit(self, painter, pixmap, rect):
+        """Copy only rect of a full-widget pixmap, whose source pixels are scaled by its pixel ratio"""
+        ratio = pixmap.devicePixelRatio()
+        source = QRectF(rect.x() * ratio, rect.y() * ratio, rect.width() * ratio, rect.height() * ratio)
+        painter.drawPixmap(QRectF(rect), pixmap, source)
+    
+    def _blit_strip(self, painter, pixmap, strip, rect):
+        """Copy the part of rect that falls in strip from a pixmap holding just that strip"""
+        rect = rect.intersected(strip)
+        if rect.isEmpty():
+            return
+        ratio = pixmap.devicePixelRatio()
+        source = QRectF((rect.x() - strip.x()) * ratio, (rect.y() - strip.y()) * ratio,
+                        rect.width() * ratio, rect.height() * ratio)
+        painter.drawPixmap(QRectF(rect), pixmap, source)
+    
+    def _draw_maze(self, painter, rect):
+        """Draw the maze layout within rect"""
+        # Background and walls never change, so they come from a cached pixmap
+        if self._maze_pixmap is None or self._maze_pixmap.devicePixelRatio() != self.devicePixelRatioF():
+            self._rebuild_maze_pixmap()
+        # The background is opaque, so it is copied rather than blended over the old frame
+        painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_Source)
+        self._blit(painter, self._maze_pixmap, rect)
+        painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_SourceOver)
+        
+        # Dots come from a second cached pixmap that eaten dots are erased from
+        if self._dots_pixmap is None or self._dots_pixmap.devicePixelRatio() != self.devicePixelRatioF():
+            self._rebuild_dots()
+        self._blit(painter, self._dots_pixmap, rect)
+        
+        # Make power pellets pulsate
+        size = 10 if self.blink_state else 8
+        offset = CELL_SIZE//2 - size//2
+        pellets = QPainterPath()
+        add_ellipse = pellets.addEllipse
+        for x, y in self._pellet_positions:
+            add_ellipse(x * CELL_SIZE + offset, y * CELL_SIZE + offset, size, size)
+        painter.fillPath(pellets, POWER_PELLET_BRUSH)
     
     def _draw_pacman(self, painter):
         """Draw Pacman with animation"""
         x, y = self.pacman_pos
-        painter.setBrush(PACMAN_COLOR)
+        key = (self.pacman_dir, self.pacman_anim_frame)
+        sprite = self._pacman_sprites.get(key)
+        if sprite is None:
+            sprite = self._pacman_sprites[key] = self._render_pacman_sprite(*key)
+        painter.drawPixmap(x * CELL_SIZE, y * CELL_SIZE, sprite)
+    
+    def _render_pacman_sprite(self, direction, frame) -> QPixmap:
+        """Render Pacman facing a direction at an animation frame into a sprite"""
+        sprite = self._create_sprite()
+        painter = QPainter(sprite)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setBrush(PACMAN_BRUSH)
         painter.setPen(Qt.PenStyle.NoPen)
         
-        # Determine Pacman's mouth angle based on direction and animation frame
-        start_angle = 0
-        if self.pacman_dir == RIGHT:
-            start_angle = 0
-        elif self.pacman_dir == DOWN:
-            start_angle = 90
-        elif self.pacman_dir == LEFT:
-            start_angle = 180
-        elif self.pacman_dir == UP:
-            start_angle = 270
-        
-        # Animation - mouth opens and closes
-        mouth_angle = 45 - (self.pacman_anim_frame * 15)
-        if mouth_angle < 0:
-            mouth_angle = -mouth_angle
-        
-        # Draw Pacman with animated mouth
-        painter.drawPie(x * CELL_SIZE + 2, y * CELL_SIZE + 2, 
-                       CELL_SIZE - 4, CELL_SIZE - 4, 
-                       (start_angle + mouth_angle) * 16, (360 - 2 * mouth_angle) * 16)
-    
-    def _draw_ghost(self, painter, ghost):
-        """Draw a ghost with eyes and animation"""
-        x, y = ghost["pos"]
-        
-        # Determine ghost color based on state
-        if ghost["eaten"]:
-            # Just eyes for eaten ghosts
-            self._draw_ghost_eyes(painter, x, y, ghost["dir"])
-            return
-        elif ghost["frightened"]:
-            if self.power_pellet_timer < 10 and self.power_pellet_flash:
-                ghost_color = GHOST_COLORS[ghost["color"] == GHOST_COLORS[0]]  # Flash between blue and white
-            else:
-                ghost_color = GHOST_FRIGHTENED_COLOR
-        else:
-            ghost_color = ghost["color"]
-        
-        # Draw ghost body (rounded rectangle with wavy bottom)
-        path = QPainterPath()
+        # Draw Pacman with animated mouth, from the precomputed angles
+        painter.drawPie(2, 2, CELL_SIZE - 4, CELL_SIZE - 4, *PACMAN_ARCS[direction, frame])
+        painter.end()
+        return sprite
+    
+    def _create_ghost_paths(self) -> Tuple[QPainterPath, QPainterPath]:
+        """Build the ghost body and wavy-bottom cut-out paths once, relative to a cell's corner"""
+        body = QPainterPath()
         
         # Top half is a semi-circle
-        path.addEllipse(x * CELL_SIZE + 2, y * CELL_SIZE + 2, CELL_SIZE - 4, (CELL_SIZE - 4) / 2)
-        
-        # Bottom half with wavy edge
-        bottom_y = y * CELL_SIZE + 2 + (CELL_SIZE - 4) / 2
+        body.addEllipse(2, 2, CELL_SIZE - 4, (CELL_SIZE - 4) / 2)
         
         # Base rectangle for bottom half
-        path.addRect(x * CELL_SIZE + 2, bottom_y, CELL_SIZE - 4, (CELL_SIZE - 4) / 2)
+        body.addRect(2, 2 + (CELL_SIZE - 4) / 2, CELL_SIZE - 4, (CELL_SIZE - 4) / 2)
         
-        # Draw the ghost
-        painter.fillPath(path, ghost_color)
-        
-        # Draw the wavy bottom using small ellipses
+        # The wavy bottom edge is cut out with small ellipses in the background color
+        waves = QPainterPath()
+        waves.setFillRule(Qt.FillRule.WindingFill)
         wave_count = 4
         wave_width = (CELL_SIZE - 4) / wave_count
+        for wave in range(wave_count):
+            waves.addEllipse(2 + wave * wave_width, CELL_SIZE - 4, wave_width, 4)
         
-        painter.setBrush(BACKGROUND_COLOR)
-        for i in range(wave_count):
-            wave_x = x * CELL_SIZE + 2 + i * wave_width
-            wave_y = y * CELL_SIZE + CELL_SIZE - 4
-            painter.drawEllipse(wave_x, wave_y, wave_width, 4)
+        return body, waves
+    
+    def _draw_ghosts(self, painter, region):
+        """Draw the ghosts within region, with eyes and animation"""
+        flashing = self.power_pellet_timer < 10 and self.power_pellet_flash
+        sprites = self._ghost_sprites
+        for i, (x, y), direction, frightened, eaten in zip(range(NUM_GHOSTS), self.ghost_pos, self.ghost_dir,
+                                                            self.ghost_frightened, self.ghost_eaten):
+            left, top = x * CELL_SIZE, y * CELL_SIZE
+            if not region.intersects(QRect(left, top, CELL_SIZE, CELL_SIZE)):
+                continue
+            
+            # Determine ghost body based on state
+            if eaten:
+                body = GHOST_BODY_NONE  # Just eyes for eaten ghosts
+            elif frightened:
+                body = GHOST_BODY_FLASH if flashing else GHOST_BODY_FRIGHTENED  # Flash between blue and white
+            else:
+                body = i
+            
+            key = (body, direction)
+            sprite = sprites.get(key)
+            if sprite is None:
+                sprite = sprites[key] = self._render_ghost_sprite(body, direction)
+            painter.drawPixmap(left, top, sprite)
+    
+    def _render_ghost_sprite(self, body, direction) -> QPixmap:
+        """Render a ghost with a GHOST_BODY_BRUSHES body, looking in a direction, into a sprite"""
+        sprite = self._create_sprite()
+        painter = QPainter(sprite)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        
+        # Draw ghost body (rounded rectangle with wavy bottom) from the shared template paths
+        ghost_brush = GHOST_BODY_BRUSHES[body]
+        if ghost_brush is not None:
+            painter.fillPath(self._ghost_body_path, ghost_brush)
+            painter.fillPath(self._ghost_waves_path, BACKGROUND_BRUSH)
         
         # Draw eyes
-        self._draw_ghost_eyes(painter, x, y, ghost["dir"])
+        self._draw_ghost_eyes(painter, direction)
+        painter.end()
+        return sprite
     
-    def _draw_ghost_eyes(self, painter, x, y, direction):
-        """Draw ghost eyes looking in the direction of movement"""
-        # Draw eye whites
-        painter.setBrush(GHOST_EYES_COLOR)
-        painter.setPen(Qt.PenStyle.NoPen)
-        
-        # Left eye
-        left_eye_x = x * CELL_SIZE + CELL_SIZE//3 - 2
-        left_eye_y = y * CELL_SIZE + CELL_SIZE//3 - 2
-        painter.drawEllipse(left_eye_x, left_eye_y, 6, 6)
-        
-        # Right eye
-        right_eye_x = x * CELL_SIZE + 2*CELL_SIZE//3 - 2
-        right_eye_y = y * CELL_SIZE + CELL_SIZE//3 - 2
-        painter.drawEllipse(right_eye_x, right_eye_y, 6, 6)
-        
-        # Draw pupils that look in the direction of movement
-        painter.setBrush(GHOST_PUPILS_COLOR)
-        
-        # Calculate pupil offset based on direction
-        pupil_offset_x = 0
-        pupil_offset_y = 0
-        
-        if direction == RIGHT:
-            pupil_offset_x = 1
-        elif direction == LEFT:
-            pupil_offset_x = -1
-        elif direction == DOWN:
-            pupil_offset_y = 1
-        elif direction == UP:
-            pupil_offset_y = -1
-        
-        # Left pupil
-        painter.drawEllipse(left_eye_x + 2 + pupil_offset_x, left_eye_y + 2 + pupil_offset_y, 3, 3)
+    def _draw_ghost_eyes(self, painter, direction):
+        """Draw ghost eyes looking in the direction of movement, relative to a cell's corner"""
+        # Eye whites and pupils are each batched into one path and filled once
+        left_eye_x = CELL_SIZE//3 - 2
+        right_eye_x = 2*CELL_SIZE//3 - 2
+        eye_y = CELL_SIZE//3 - 2
+        
+        whites = QPainterPath()
+        whites.addEllipse(left_eye_x, eye_y, 6, 6)
+        whites.addEllipse(right_eye_x, eye_y, 6, 6)
+        painter.fillPath(whites, GHOST_EYES_BRUSH)
+        
+        # Pupils look in the direction of movement, one pixel off center
+        pupil_y = eye_y + 2 + DY[direction]
+        pupils = QPainterPath()
+        pupils.addEllipse(left_eye_x + 2 + DX[direction], pupil_y, 3, 3)
+        pupils.addEllipse(right_eye_x + 2 + DX[direction], pupil_y, 3, 3)
+        painter.fillPath(pupils, GHOST_PUPILS_BRUSH)
+    
+    def _render_text_layer(self, paint) -> QPixmap:
+        """Render a paint function into a transparent full-widget pixmap"""
+        pixmap = self._create_pixmap(GAME_WIDTH, GAME_HEIGHT)
+        pixmap.fill(Qt.GlobalColor.transparent)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        paint(painter)
+        painter.end()
+        return pixmap
+    
+    def _draw_ui(self, painter, rect):
+        """Draw score, high score, and lives within rect"""
+        if self._ui_dirty or self._ui_pixmap is None:
+            self._rebuild_ui_strips()
+            self._overlay_pixmap = None  # The title and game over screens show the same values
+            self._ui_dirty = False
+        self._blit_strip(painter, self._ui_pixmap, SCORE_LINE_RECT, rect)
+        if not self.can_play:
+            self._blit_strip(painter, self._quota_pixmap, QUOTA_LINE_RECT, rect)
+    
+    def _rebuild_ui_strips(self):
+        """Re-render the score line, and the quota line while play is locked, into their strips"""
+        if self._ui_pixmap is None:
+            self._ui_pixmap = self._create_pixmap(GAME_WIDTH, CELL_SIZE)
+        self._ui_pixmap.fill(Qt.GlobalColor.transparent)
+        painter = QPainter(self._ui_pixmap)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        self._paint_ui(painter)
+        painter.end()
         
-        # Right pupil
-        painter.drawEllipse(right_eye_x + 2 + pupil_offset_x, right_eye_y + 2 + pupil_offset_y, 3, 3)
+        # The quota can't change during a game, so this strip is never refilled while playing
+        if not self.can_play:
+            if self._quota_pixmap is None:
+                self._quota_pixmap = self._create_pixmap(GAME_WIDTH, CELL_SIZE)
+            self._quota_pixmap.fill(Qt.GlobalColor.transparent)
+            painter = QPainter(self._quota_pixmap)
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+            painter.setPen(QUOTA_PEN)
+            painter.setFont(SCORE_FONT)
+            painter.drawText(10, CELL_SIZE - 10, self._quota_short)
+            painter.end()
+    
+    def _draw_game_state(self, painter, rect):
+        """Draw messages for different game states within rect"""
+        if self.state == GAME_RUNNING:
+            return
+        if self._overlay_pixmap is None or self._overlay_state != self.state:
+            self._overlay_pixmap = self._render_text_layer(self._paint_game_state)
+            self._overlay_state = self.state
+        self._blit(painter, self._overlay_pixmap, rect)
     
-    def _draw_ui(self, painter):
-        """Draw score, high score, and lives"""
+    def _paint_ui(self, painter):
+        """Paint score, high score, and lives"""
         # Draw score
-        painter.setPen(TEXT_COLOR)
-        painter.setFont(QFont("Arial", 10, QFont.Weight.Bold))
+        painter.setPen(TEXT_PEN)
+        painter.setFont(SCORE_FONT)
         painter.drawText(10, 20, f"Score: {self.score}")
         
         # Draw high score
@@ -950,47 +1218,36 @@ class PacmanGame(QWidget):
         text_width = painter.fontMetrics().horizontalAdvance(lives_text)
         
         painter.drawText(GAME_WIDTH - text_width - 10, 20, lives_text)
-        
-        # If quota is active, show it
-        if not self.can_play:
-            cards_left = self.settings["cards_quota"] - self.settings["cards_completed"]
-            quota_text = f"Cards to Review: {cards_left}"
-            painter.setPen(QColor(255, 165, 0))  # Orange
-            painter.drawText(10, GAME_HEIGHT - 10, quota_text)
     
-    def _draw_game_state(self, painter):
-        """Draw messages for different game states"""
+    def _paint_game_state(self, painter):
+        """Paint messages for different game states"""
         if self.state == GAME_PAUSED:
             # Semi-transparent overlay
-            overlay = QColor(0, 0, 0, 150)
-            painter.fillRect(0, 0, GAME_WIDTH, GAME_HEIGHT, overlay)
+            painter.fillRect(0, 0, GAME_WIDTH, GAME_HEIGHT, PAUSED_OVERLAY_BRUSH)
             
             # Pause message
-            painter.setPen(TEXT_COLOR)
-            painter.setFont(QFont("Arial", 20, QFont.Weight.Bold))
+            painter.setPen(TEXT_PEN)
+            painter.setFont(PAUSED_FONT)
             painter.drawText(GAME_WIDTH//2 - 50, GAME_HEIGHT//2, "PAUSED")
-            painter.setFont(QFont("Arial", 12))
+            painter.setFont(MESSAGE_FONT)
             painter.drawText(GAME_WIDTH//2 - 90, GAME_HEIGHT//2 + 30, "Press P to resume")
             
         elif self.state == GAME_STOPPED:
             # Title screen
             # Semi-transparent overlay
-            overlay = QColor(0, 0, 0, 180)
-            painter.fillRect(0, 0, GAME_WIDTH, GAME_HEIGHT, overlay)
+            painter.fillRect(0, 0, GAME_WIDTH, GAME_HEIGHT, MENU_OVERLAY_BRUSH)
             
             # Title
-            painter.setPen(PACMAN_COLOR)
-            painter.setFont(QFont("Arial", 26, QFont.Weight.Bold))
+            painter.setPen(PACMAN_PEN)
+            painter.setFont(TITLE_FONT)
             painter.drawText(GAME_WIDTH//2 - 140, GAME_HEIGHT//2 - 40, "ANKI PACMAN")
             
             # Instructions
-            painter.setPen(TEXT_COLOR)
-            painter.setFont(QFont("Arial", 12))
+            painter.setPen(TEXT_PEN)
+            painter.setFont(MESSAGE_FONT)
             
             if not self.can_play:
-                cards_left = self.settings["cards_quota"] - self.settings["cards_completed"]
-                painter.drawText(GAME_WIDTH//2 - 170, GAME_HEIGHT//2 + 10, 
-                                f"You need to review {cards_left} more card(s) to play")
+                painter.drawText(GAME_WIDTH//2 - 170, GAME_HEIGHT//2 + 10, self._quota_long)
             else:
                 painter.drawText(GAME_WIDTH//2 - 120, GAME_HEIGHT//2 + 10, "Press SPACE to start")
                 
@@ -1000,40 +1257,56 @@ class PacmanGame(QWidget):
         elif self.state == GAME_OVER:
             # Game over screen
             # Semi-transparent overlay
-            overlay = QColor(0, 0, 0, 180)
-            painter.fillRect(0, 0, GAME_WIDTH, GAME_HEIGHT, overlay)
+            painter.fillRect(0, 0, GAME_WIDTH, GAME_HEIGHT, MENU_OVERLAY_BRUSH)
             
             # Game over message
-            painter.setPen(QColor(255, 0, 0))  # Red for game over
-            painter.setFont(QFont("Arial", 24, QFont.Weight.Bold))
+            painter.setPen(GAME_OVER_PEN)
+            painter.setFont(GAME_OVER_FONT)
             painter.drawText(GAME_WIDTH//2 - 100, GAME_HEIGHT//2 - 40, "GAME OVER")
             
             # Final score
-            painter.setPen(TEXT_COLOR)
-            painter.setFont(QFont("Arial", 16))
+            painter.setPen(TEXT_PEN)
+            painter.setFont(FINAL_SCORE_FONT)
             painter.drawText(GAME_WIDTH//2 - 80, GAME_HEIGHT//2, f"Score: {self.score}")
             
             if self.score == self.high_score and self.score > 0:
-                painter.setPen(QColor(255, 215, 0))  # Gold for high score
+                painter.setPen(HIGH_SCORE_PEN)
                 painter.drawText(GAME_WIDTH//2 - 100, GAME_HEIGHT//2 + 30, "NEW HIGH SCORE!")
             
             # Review message
-            painter.setPen(TEXT_COLOR)
-            painter.setFont(QFont("Arial", 14))
+            painter.setPen(TEXT_PEN)
+            painter.setFont(REVIEW_FONT)
             
-            quota = self.settings["cards_quota"]
-            painter.drawText(GAME_WIDTH//2 - 160, GAME_HEIGHT//2 + 70, 
-                            f"Time to review {quota} flashcards!")
+            painter.drawText(GAME_WIDTH//2 - 160, GAME_HEIGHT//2 + 70, self._quota_review)
+
 
+# Deck ids and names, cached until Anki reports that the decks changed
+_decks_cache: Optional[Dict[int, str]] = None
 
 # Get all available decks from Anki
 def get_all_decks():
     """Get all available decks from Anki collection"""
-    decks = {}
-    for deck in mw.col.decks.all_names_and_ids():
-        # In newer Anki versions, all_names_and_ids returns DeckNameId objects
-        decks[deck.id] = deck.name
-    return decks
+    global _decks_cache
+    if _decks_cache is None:
+        decks = {}
+        for deck in mw.col.decks.all_names_and_ids():
+            # In newer Anki versions, all_names_and_ids returns DeckNameId objects
+            decks[deck.id] = deck.name
+        _decks_cache = decks
+    return _decks_cache
+
+def clear_decks_cache(*args):
+    """Forget the cached decks so the next get_all_decks() reads them again"""
+    global _decks_cache
+    _decks_cache = None
+
+def _on_operation_did_execute(changes, handler):
+    """Drop the decks cache when an operation added, renamed or removed decks"""
+    if changes.deck:
+        clear_decks_cache()
+
+gui_hooks.operation_did_execute.append(_on_operation_did_execute)
+gui_hooks.collection_did_load.append(clear_decks_cache)
 
 
 # Main dialog for the game
@@ -1057,11 +1330,11 @@ class PacmanDialog(QDialog):
         self.pause_button = QPushButton("Pause")
         self.quit_button = QPushButton("Quit")
         
-        # If quota is active, add a review button
-        if not self.game.can_play:
-            self.review_button = QPushButton("Review Now")
-            qconnect(self.review_button.clicked, self.start_review_now)
-            button_layout.addWidget(self.review_button)
+        # The review button is only shown while a quota is active
+        self.review_button = QPushButton("Review Now")
+        qconnect(self.review_button.clicked, self.start_review_now)
+        self.review_button.setVisible(not self.game.can_play)
+        button_layout.addWidget(self.review_button)
         
         qconnect(self.start_button.clicked, self.game.start_game)
         qconnect(self.pause_button.clicked, self.game.pause_game)
@@ -1081,9 +1354,21 @@ class PacmanDialog(QDialog):
         # Initialize dialog
         self.setLayout(layout)
         
-        # To prevent garbage collection
+        # Game-over and card selection dialogs, built the first time they are shown
+        self._game_over_box = None
+        self._card_selection_dialog = None
+        self._combo_decks = None  # Decks the combo box was last filled from
+        
+        # To prevent garbage collection, until Qt deletes the dialog (PyQt has no QPointer)
         global pacman_dialog
         pacman_dialog = self
+        qconnect(self.destroyed, _forget_pacman_dialog)
+    
+    def hideEvent(self, event):
+        """Pause a running game while the dialog is hidden, since closing it only hides it"""
+        if self.game.state == GAME_RUNNING:
+            self.game.pause_game()
+        super().hideEvent(event)
     
     def start_review_now(self):
         """Start reviews without waiting for game over"""
@@ -1102,18 +1387,19 @@ class PacmanDialog(QDialog):
         self.final_score = score
         self.quota = quota
         
-        # Create a message box to inform the user
-        msg_box = QMessageBox(self)
-        msg_box.setWindowTitle("Game Over")
-        msg_box.setText(f"Game Over! Your score: {score}\n\nYou need to complete {quota} flashcard reviews before playing again.")
-        msg_box.setStandardButtons(QMessageBox.StandardButton.Ok)
-        msg_box.exec()
+        # Inform the user with a message box that is built once and reused
+        if self._game_over_box is None:
+            self._game_over_box = QMessageBox(self)
+            self._game_over_box.setWindowTitle("Game Over")
+            self._game_over_box.setStandardButtons(QMessageBox.StandardButton.Ok)
+        self._game_over_box.setText(f"Game Over! Your score: {score}\n\nYou need to complete {quota} flashcard reviews before playing again.")
+        self._game_over_box.exec()
         
         # Show card selection dialog
         self.show_card_selection(quota)
     
-    def show_card_selection(self, quota):
-        """Show a dialog to select which cards to review"""
+    def _create_card_selection_dialog(self) -> QDialog:
+        """Build the dialog to select which cards to review, once"""
         # Create the dialog
         dialog = QDialog(self)
         dialog.setWindowTitle("Select Cards to Review")
@@ -1122,30 +1408,14 @@ class PacmanDialog(QDialog):
         # Create layout
         layout = QVBoxLayout()
         
-        # Add label
-        label = QLabel(f"You need to review {quota} cards before playing again.\nSelect options for your review:")
-        layout.addWidget(label)
+        # Add label, whose text is set for each quota
+        self._card_selection_label = QLabel()
+        layout.addWidget(self._card_selection_label)
         
-        # Add deck selection
+        # Add deck selection, filled from the decks cache when shown
         deck_layout = QHBoxLayout()
         deck_label = QLabel("Deck:")
         self.deck_combo = QComboBox()
-        
-        # Get all decks
-        decks = get_all_decks()
-        selected_deck_id = self.game.settings.get("selected_deck_id", None)
-        
-        # Add "All Decks" option
-        self.deck_combo.addItem("All Decks", None)
-        
-        # Add all available decks
-        for deck_id, deck_name in decks.items():
-            self.deck_combo.addItem(deck_name, deck_id)
-            
-            # Select previously used deck if available
-            if selected_deck_id and deck_id == selected_deck_id:
-                self.deck_combo.setCurrentIndex(self.deck_combo.count() - 1)
-        
         deck_layout.addWidget(deck_label)
         deck_layout.addWidget(self.deck_combo)
         layout.addLayout(deck_layout)
@@ -1159,9 +1429,6 @@ class PacmanDialog(QDialog):
         self.review_cards_radio = QRadioButton("Review Cards")
         self.both_cards_radio = QRadioButton("Both New and Review Cards")
         
-        # Set review cards as default
-        self.review_cards_radio.setChecked(True)
-        
         layout.addWidget(self.new_cards_radio)
         layout.addWidget(self.review_cards_radio)
         layout.addWidget(self.both_cards_radio)
@@ -1173,6 +1440,40 @@ class PacmanDialog(QDialog):
         layout.addWidget(button_box)
         
         dialog.setLayout(layout)
+        return dialog
+    
+    def _fill_deck_combo(self):
+        """Fill the deck combo box, unless it already shows the cached decks"""
+        decks = get_all_decks()
+        if decks is self._combo_decks:
+            return
+        self._combo_decks = decks
+        
+        self.deck_combo.clear()
+        
+        # Add "All Decks" option
+        self.deck_combo.addItem("All Decks", None)
+        
+        # Add all available decks
+        for deck_id, deck_name in decks.items():
+            self.deck_combo.addItem(deck_name, deck_id)
+    
+    def show_card_selection(self, quota):
+        """Show a dialog to select which cards to review"""
+        if self._card_selection_dialog is None:
+            self._card_selection_dialog = self._create_card_selection_dialog()
+        dialog = self._card_selection_dialog
+        
+        self._card_selection_label.setText(f"You need to review {quota} cards before playing again.\nSelect options for your review:")
+        
+        # Select previously used deck if available
+        self._fill_deck_combo()
+        selected_deck_id = self.game.settings.get("selected_deck_id", None)
+        index = self.deck_combo.findData(selected_deck_id) if selected_deck_id else 0
+        self.deck_combo.setCurrentIndex(max(index, 0))
+        
+        # Set review cards as default
+        self.review_cards_radio.setChecked(True)
         
         # Show the dialog
         result = dialog.exec()
@@ -1186,6 +1487,9 @@ class PacmanDialog(QDialog):
             
             # Start reviews based on selection
             self.start_reviews(quota, selected_deck_id)
+        
+        # A cancelled selection leaves the quota pending, so reviews must stay reachable
+        self.review_button.setVisible(not self.game.can_play)
     
     def start_reviews(self, quota, deck_id=None):
         """Start the flashcard review process"""
@@ -1214,14 +1518,7 @@ class PacmanDialog(QDialog):
         self.game.reset_after_review()
         
         # Refresh the UI - show review button if still needed
-        if not self.game.can_play:
-            # Check if we already have a review button
-            has_review_button = hasattr(self, 'review_button')
-            
-            if not has_review_button:
-                self.review_button = QPushButton("Review Now")
-                qconnect(self.review_button.clicked, self.start_review_now)
-                self.layout().itemAt(1).layout().insertWidget(0, self.review_button)
+        self.review_button.setVisible(not self.game.can_play)
 
 
 # Function to review flashcards
@@ -1268,8 +1565,6 @@ def review_flashcards(num_reviews: int, card_type: str, game: PacmanGame, deck_i
 # Function to get due cards
 def get_due_cards(num_cards: int, card_type: str, deck_id=None) -> List[Card]:
     """Get a list of due cards from the collection"""
-    cards = []
-    
     # Build the search query
     deck_query = ""
     if deck_id:
@@ -1281,10 +1576,8 @@ def get_due_cards(num_cards: int, card_type: str, deck_id=None) -> List[Card]:
         card_ids = mw.col.find_cards(f"{deck_query}is:new")
     elif card_type == "review":
         card_ids = mw.col.find_cards(f"{deck_query}is:due")
-    else:  # Both
-        card_ids = mw.col.find_cards(f"{deck_query}is:due")
-        new_ids = mw.col.find_cards(f"{deck_query}is:new")
-        card_ids.extend(new_ids)
+    else:  # Both, in one search with due cards ordered before new ones (type 0)
+        card_ids = mw.col.find_cards(f"{deck_query}(is:due OR is:new)", order="c.type = 0")
     
     # If no cards of the requested type, try the other type
     if not card_ids and card_type == "review":
@@ -1294,12 +1587,16 @@ def get_due_cards(num_cards: int, card_type: str, deck_id=None) -> List[Card]:
         # No new cards, try review cards
         card_ids = mw.col.find_cards(f"{deck_query}is:due")
     
-    # Get the cards
-    for card_id in card_ids[:num_cards]:
-        card = mw.col.get_card(card_id)
-        cards.append(card)
-    
-    return cards
+    # Get only the cards that will be reviewed
+    return [mw.col.get_card(card_id) for card_id in card_ids[:num_cards]]
+
+
+# Card HTML containing any of these needs a web engine: scripts, MathJax, or audio/video
+WEB_ONLY_MARKERS = ("<script", "\\(", "\\[", "<audio", "<video", "[anki:play")
+
+def needs_web_view(html: str) -> bool:
+    """Check whether card HTML needs a QWebEngineView instead of Qt's rich text engine"""
+    return any(marker in html for marker in WEB_ONLY_MARKERS)
 
 
 # Dialog for reviewing flashcards
@@ -1336,10 +1633,18 @@ class FlashcardReviewDialog(QDialog):
         
         layout.addLayout(progress_layout)
         
-        # Add card content
-        self.card_content = QWebEngineView(self)
-        self.card_content.setMinimumHeight(200)
-        layout.addWidget(self.card_content)
+        # Add card content - most cards are plain HTML that Qt's rich text engine renders,
+        # so a web view is only created for the first card that needs one
+        self.media_dir = mw.col.media.dir()
+        self.card_content = QTextBrowser(self)
+        self.card_content.setOpenExternalLinks(True)
+        self.card_content.setSearchPaths([self.media_dir])
+        self.web_content = None
+        
+        self.card_stack = QStackedWidget(self)
+        self.card_stack.setMinimumHeight(200)
+        self.card_stack.addWidget(self.card_content)
+        layout.addWidget(self.card_stack)
         
         # Add answer buttons
         button_layout = QHBoxLayout()
@@ -1435,7 +1740,7 @@ class FlashcardReviewDialog(QDialog):
             pass  # Ignore errors
         
         # Show question
-        self.card_content.setHtml(card.question())
+        self.set_card_html(card.question())
         
         # Reset answer shown flag
         self.answer_shown = False
@@ -1459,7 +1764,7 @@ class FlashcardReviewDialog(QDialog):
         card = self.cards[self.current_index]
         
         # Show answer
-        self.card_content.setHtml(card.answer())
+        self.set_card_html(card.answer())
         
         # Set answer shown flag
         self.answer_shown = True
@@ -1474,6 +1779,18 @@ class FlashcardReviewDialog(QDialog):
         # Set focus to enable keyboard shortcuts
         self.setFocus()
     
+    def set_card_html(self, html: str):
+        """Show card HTML in the text browser, or in the web view if the card needs one"""
+        if needs_web_view(html):
+            if self.web_content is None:
+                self.web_content = QWebEngineView(self)
+                self.card_stack.addWidget(self.web_content)
+            self.web_content.setHtml(html, QUrl.fromLocalFile(self.media_dir + os.sep))
+            self.card_stack.setCurrentWidget(self.web_content)
+        else:
+            self.card_content.setHtml(html)
+            self.card_stack.setCurrentWidget(self.card_content)
+    
     def answer_card(self, ease: int):
         """Answer the current card and move to next"""
         if self.current_index >= len(self.cards):
@@ -1554,75 +1871,127 @@ class FlashcardReviewDialog(QDialog):
         self.accept()
 
 
+# Stylesheet for a much more compact button, selected by the button's object name
+PACMAN_BUTTON_STYLESHEET = """
+    QPushButton#pacman {
+        background-color: #333333; 
+        color: #FFD800;
+        border-radius: 12px;
+        min-width: 24px;
+        max-width: 24px;
+        min-height: 24px;
+        max-height: 24px;
+        padding: 0px;
+        font-weight: bold;
+        font-size: 12px;
+        border: 1px solid #666666;
+    }
+    QPushButton#pacman:hover {
+        background-color: #444444;
+        border: 1px solid #FFD800;
+    }
+    QPushButton#pacman:pressed {
+        background-color: #222222;
+    }
+"""
+
 class StyledPacmanButton(QPushButton):
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.setObjectName("pacman")
         self.setText("🟡")  # Using a yellow circle emoji as a Pacman-like icon
         self.setToolTip("Play Pacman")  # Show text on hover
         
         # Create a much more compact button
-        self.setStyleSheet("""
-            QPushButton {
-                background-color: #333333; 
-                color: #FFD800;
-                border-radius: 12px;
-                min-width: 24px;
-                max-width: 24px;
-                min-height: 24px;
-                max-height: 24px;
-                padding: 0px;
-                font-weight: bold;
-                font-size: 12px;
-                border: 1px solid #666666;
-            }
-            QPushButton:hover {
-                background-color: #444444;
-                border: 1px solid #FFD800;
-            }
-            QPushButton:pressed {
-                background-color: #222222;
-            }
-        """)
+        self.setStyleSheet(PACMAN_BUTTON_STYLESHEET)
 
 
 # Create menu item
 def open_pacman_game():
     """Open the Pacman game dialog"""
     global pacman_dialog
-    if pacman_dialog is None or not pacman_dialog.isVisible():
+    if pacman_dialog is None:
         pacman_dialog = PacmanDialog(mw)
     
+    # Already in front - nothing to ask the window manager for
+    if pacman_dialog.isVisible() and pacman_dialog.isActiveWindow():
+        return
+    
     pacman_dialog.show()
     pacman_dialog.raise_()
     pacman_dialog.activateWindow()
 
 
+class _ResizeWatcher(QObject):
+    """Event filter calling a function once a widget has stopped resizing for a moment"""
+    def __init__(self, widget: QWidget, on_resized: Callable[[], None], delay: int = 50):
+        super().__init__(widget)
+        # A drag resizes many times, so the call waits until the resizing has paused
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay)
+        qconnect(self.timer.timeout, on_resized)
+        widget.installEventFilter(self)
+    
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Type.Resize:
+            self.timer.start()
+        return False  # Never swallow the event
+
+
+# Watcher repositioning the button, so setting up again replaces it
+_resize_watcher = None
+
 # Add Pacman button to Anki main window (compatible with Anki 24.11+)
 def setup_pacman_button():
     """Add Pacman button to Anki in a way that's compatible with newer Anki versions"""
+    global _resize_watcher
     try:
+        # Drop the repositioning hook of a previous setup
+        if _resize_watcher is not None:
+            mw.removeEventFilter(_resize_watcher)
+            _resize_watcher.deleteLater()
+            _resize_watcher = None
+        
         # Create the button
         pacman_button = StyledPacmanButton()
         qconnect(pacman_button.clicked, open_pacman_game)
         
-        # Add to main window - newer Anki versions
-        # For Anki 24.11+, we need a different approach
-        # Add button directly to main window instead of toolbar
+        # Where the menu bar is a regular widget, it lays the button out in its
+        # top-right corner itself, with no resize handling needed
+        menubar = mw.form.menubar
+        if not menubar.isNativeMenuBar():
+            menubar.setCornerWidget(pacman_button, Qt.Corner.TopRightCorner)
+            return pacman_button
+        
+        # A native menu bar (macOS) has no corner to put the button in, so it is
+        # added directly to the main window instead (Anki 24.11+ has no toolbar for it)
         pacman_button.setParent(mw)
         pacman_button.show()
         
-        # Position the button in the top-right corner
+        # The stylesheet fixes the button's size, so it is measured once
+        pacman_button.adjustSize()
+        button_width = pacman_button.width()
+        toolbar_height = 40  # Estimated toolbar height
+        
+        # Position the button in the top-right corner, which only moves with the window's width
+        last_width = None
         def reposition_button():
-            toolbar_height = 40  # Estimated toolbar height
-            button_width = pacman_button.width()
-            mw_width = mw.width()
-            pacman_button.move(mw_width - button_width - 20, toolbar_height + 10)
+            nonlocal last_width
+            width = mw.width()
+            if width == last_width:
+                return
+            last_width = width
+            pacman_button.move(width - button_width - 20, toolbar_height + 10)
         
         # Reposition when window is resized
-        mw.resized.connect(reposition_button)
+        _resize_watcher = _ResizeWatcher(mw, reposition_button)
         
-        # Initial positioning
-        QTimer.singleShot(500, reposition_button)
+        # Initial positioning - a window that is not shown yet gets its first resize
+        # (and so its first positioning) when it is shown; a visible one is positioned
+        # on the next event loop pass, after any pending layout has been applied
+        if mw.isVisible():
+            QTimer.singleShot(0, reposition_button)
         
         return pacman_button
     except Exception as e:
@@ -1630,18 +1999,19 @@ def setup_pacman_button():
         return None
 
 
-# Create menu item for the game (keep this for backward compatibility)
-pacman_action = QAction("Play Pacman", mw)
-qconnect(pacman_action.triggered, open_pacman_game)
-mw.form.menuTools.addAction(pacman_action)
+# Create menu item for the game (keep this for backward compatibility) - it is
+# only built the first time the Tools menu opens, so startup skips it
+pacman_action = None
 
-# Add the styled button using the compatible method
-pacman_button = setup_pacman_button()
+def _add_pacman_action():
+    """Add the Play Pacman action to the Tools menu as it is about to show, once"""
+    global pacman_action
+    mw.form.menuTools.aboutToShow.disconnect(_add_pacman_action)
+    pacman_action = QAction("Play Pacman", mw)
+    qconnect(pacman_action.triggered, open_pacman_game)
+    mw.form.menuTools.addAction(pacman_action)
 
+qconnect(mw.form.menuTools.aboutToShow, _add_pacman_action)
 
-# Make sure user_files directory exists
-if not os.path.exists(USER_FILES_DIR):
-    try:
-        os.makedirs(USER_FILES_DIR)
-    except Exception as e:
-        print(f"Error creating user_files directory: {e}")
+# Add the styled button using the compatible method
+pacman_button = setup_pacman_button()